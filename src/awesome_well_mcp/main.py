@@ -5,34 +5,63 @@ awesome well structure MCP 服务（井身结构示意图MCP）
 """
 
 import json
+import logging
 import subprocess
 import os
+import sys
 import shutil
 import time
-import glob
+import functools
 import importlib.util
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 from mcp.server.fastmcp import FastMCP
 
 # Create an MCP server
 mcp = FastMCP("awesome_well_MCP")
 
+# stdio传输下stdout是MCP协议通道，日志统一输出到stderr
+logger = logging.getLogger(__name__)
+
+# 井数据必填字段
+REQUIRED_WELL_FIELDS = frozenset({
+    "wellName", "totalDepth_m", "wellType",
+    "stratigraphy", "drillingFluidAndPressure", "wellboreStructure"
+})
+
+# 支持的井型
+SUPPORTED_WELL_TYPES = frozenset({"straight well", "deviated well", "horizontal well"})
+
+# 需要归档的生成文件，按移动顺序排列（MD文件最后移动）
+ARCHIVE_FILE_GROUPS = (
+    ("PNG", ("well_info.png", "well_structure_plot.png")),
+    ("CSV", (
+        "stratigraphy.csv",
+        "stratigraphy_raw.csv",
+        "casing_sections.csv",
+        "casing_sections_raw.csv",
+        "hole_sections.csv",
+        "hole_sections_raw.csv",
+        "drilling_fluid_pressure.csv",
+        "drilling_fluid_pressure_raw.csv",
+        "deviationData.csv",
+        "deviationData_raw.csv",
+        "location.csv",
+    )),
+    ("JSON", ("well_data.json", "well_data_backup.json")),
+    ("MD", ("well_structure_report.md",)),
+)
+
 
 def validate_well_data(data: Dict[str, Any]) -> bool:
     """验证井数据完整性"""
-    required_fields = [
-        "wellName", "totalDepth_m", "wellType", 
-        "stratigraphy", "drillingFluidAndPressure", "wellboreStructure"
-    ]
-    
-    for field in required_fields:
-        if field not in data:
-            return False
+    if not REQUIRED_WELL_FIELDS.issubset(data.keys()):
+        return False
     
     # 验证井型
-    if data["wellType"] not in ["straight well", "deviated well", "horizontal well"]:
+    well_type = data["wellType"]
+    if not isinstance(well_type, str) or well_type not in SUPPORTED_WELL_TYPES:
         return False
     
     # 验证深度数据
@@ -50,64 +79,74 @@ def update_well_data_file(data: Dict[str, Any]) -> bool:
         if Path("well_data.json").exists():
             shutil.copy2("well_data.json", backup_path)
         
-        # 写入新数据
+        # 写入新数据（先整体序列化，再一次性写入，避免json.dump逐块写文件）
+        content = json.dumps(data, ensure_ascii=False, indent=2)
         with open("well_data.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write(content)
         
         return True
     except Exception as e:
-        print(f"更新井数据文件失败: {e}")
+        logger.error(f"更新井数据文件失败: {e}")
         return False
 
 
+@functools.lru_cache(maxsize=None)
+def find_packaged_generator() -> Optional[Path]:
+    """查找包目录中的WellStructure.exe（结果缓存，进程内只解析一次）"""
+    try:
+        spec = importlib.util.find_spec("awesome_well_mcp")
+    except (ImportError, ValueError):
+        return None
+    if spec is None or spec.origin is None:
+        return None
+    
+    generator_path = Path(spec.origin).parent / "WellStructure.exe"
+    if not generator_path.exists():
+        return None
+    return generator_path
+
+
 def run_well_generator() -> bool:
     """启动井身结构生成器并检测PNG和报告文件生成"""
     try:
         # 首先尝试在当前目录查找
         generator_path = Path("WellStructure.exe")
         if not generator_path.exists():
-            # 如果当前目录没有，尝试在包目录中查找
-            try:
-                spec = importlib.util.find_spec("awesome_well_mcp")
-                if spec is not None and spec.origin is not None:
-                    package_dir = Path(spec.origin).parent
-                    generator_path = package_dir / "WellStructure.exe"
-                    if not generator_path.exists():
-                        print("WellStructure.exe 不存在")
-                        return False
-                else:
-                    print("WellStructure.exe 不存在")
-                    return False
-            except Exception:
-                print("WellStructure.exe 不存在")
+            # 如果当前目录没有，使用包目录中的生成器
+            generator_path = find_packaged_generator()
+            if generator_path is None:
+                logger.error("WellStructure.exe 不存在")
                 return False
         
         # 1. 启动前先清理所有生成的文件
-        print("清理现有生成文件...")
+        logger.info("清理现有生成文件...")
         cleanup_generated_files()
         
         # 2. 启动exe程序
-        print("启动井身结构生成器...")
-        process = subprocess.Popen([str(generator_path)])
-        print(f"井身结构生成器已启动，进程ID: {process.pid}")
+        logger.info("启动井身结构生成器...")
+        process = subprocess.Popen([str(generator_path)], stdout=sys.stderr)
+        logger.info(f"井身结构生成器已启动，进程ID: {process.pid}")
         
         # 3. 检测PNG图片生成
         if not wait_for_png_generation():
-            print("PNG图片生成检测失败")
+            logger.error("PNG图片生成检测失败")
             return False
         
         # 4. 检测报告文件生成
         if not wait_for_report_generation():
-            print("报告文件生成检测失败")
+            logger.error("报告文件生成检测失败")
             return False
         
-        # 5. 检测成功后等待6秒，然后继续
-        print("检测成功，等待6秒后继续...")
-        time.sleep(6)
+        # 5. 检测成功后等待生成器退出（最多6秒），然后继续
+        logger.info("检测成功，等待生成器完成写入（最多6秒）...")
+        try:
+            process.wait(timeout=6)
+        except subprocess.TimeoutExpired:
+            pass
         
         return True
     except Exception as e:
-        print(f"启动生成器失败: {e}")
+        logger.error(f"启动生成器失败: {e}")
         return False
 
 
@@ -119,7 +158,7 @@ def create_timestamp_folder() -> str:
         folder_path.mkdir(exist_ok=True)
         return str(folder_path)
     except Exception as e:
-        print(f"创建时间戳文件夹失败: {e}")
+        logger.error(f"创建时间戳文件夹失败: {e}")
         return ""
 
 def move_generated_files(folder_path: str) -> bool:
@@ -134,63 +173,23 @@ def move_generated_files(folder_path: str) -> bool:
         
         moved_files = []
         
-        # 1. 移动PNG文件
-        png_files = ["well_info.png", "well_structure_plot.png"]
-        for filename in png_files:
-            source_file = Path(filename)
-            if source_file.exists():
-                target_file = target_folder / filename
-                shutil.move(str(source_file), str(target_file))
-                moved_files.append(filename)
-                print(f"已移动PNG文件: {filename}")
-        
-        # 2. 移动CSV文件
-        csv_files = [
-            "stratigraphy.csv",
-            "stratigraphy_raw.csv",
-            "casing_sections.csv", 
-            "casing_sections_raw.csv",
-            "hole_sections.csv",
-            "hole_sections_raw.csv",
-            "drilling_fluid_pressure.csv",
-            "drilling_fluid_pressure_raw.csv",
-            "deviationData.csv",
-            "deviationData_raw.csv",
-            "location.csv"
-        ]
-        for filename in csv_files:
-            source_file = Path(filename)
-            if source_file.exists():
-                target_file = target_folder / filename
-                shutil.move(str(source_file), str(target_file))
-                moved_files.append(filename)
-                print(f"已移动CSV文件: {filename}")
-        
-        # 3. 移动JSON文件
-        json_files = ["well_data.json", "well_data_backup.json"]
-        for filename in json_files:
-            source_file = Path(filename)
-            if source_file.exists():
-                target_file = target_folder / filename
-                shutil.move(str(source_file), str(target_file))
-                moved_files.append(filename)
-                print(f"已移动JSON文件: {filename}")
-        
-        # 4. 移动MD文件（最后移动）
-        md_files = ["well_structure_report.md"]
-        for filename in md_files:
-            source_file = Path(filename)
-            if source_file.exists():
-                target_file = target_folder / filename
-                shutil.move(str(source_file), str(target_file))
+        # 按顺序移动PNG、CSV、JSON文件，MD文件最后移动
+        for _, filenames in ARCHIVE_FILE_GROUPS:
+            for filename in filenames:
+                # 归档目录位于当前目录下，直接重命名；文件不存在时跳过，省去预先的exists检查
+                try:
+                    os.replace(filename, target_folder / filename)
+                except FileNotFoundError:
+                    continue
                 moved_files.append(filename)
-                print(f"已移动MD文件: {filename}")
         
-        print(f"已移动 {len(moved_files)} 个文件到文件夹: {folder_path}")
+        if moved_files:
+            logger.debug("已移动文件: " + ", ".join(moved_files))
+        logger.info(f"已移动 {len(moved_files)} 个文件到文件夹: {folder_path}")
         return True
         
     except Exception as e:
-        print(f"移动文件失败: {e}")
+        logger.error(f"移动文件失败: {e}")
         return False
 
 
@@ -200,101 +199,70 @@ def read_report_content(report_path: str) -> str:
         with open(report_path, "r", encoding="utf-8") as f:
             return f.read()
     except Exception as e:
-        print(f"读取报告内容失败: {e}")
+        logger.error(f"读取报告内容失败: {e}")
         return ""
 
 def cleanup_generated_files():
     """清理指定的生成文件"""
     try:
-        cleaned_count = 0
-        
-        # 1. 清理报告文件
-        report_file = "well_structure_report.md"
-        if os.path.exists(report_file):
-            try:
-                os.remove(report_file)
-                cleaned_count += 1
-                print(f"已删除报告文件: {report_file}")
-            except Exception as e:
-                print(f"删除报告文件失败 {report_file}: {e}")
+        cleaned_files = []
         
-        # 2. 清理所有CSV文件
-        csv_files = [
-            "stratigraphy.csv",
-            "stratigraphy_raw.csv",
-            "casing_sections.csv",
-            "casing_sections_raw.csv",
-            "hole_sections.csv",
-            "hole_sections_raw.csv",
-            "drilling_fluid_pressure.csv",
-            "drilling_fluid_pressure_raw.csv",
-            "deviationData.csv",
-            "deviationData_raw.csv"
-        ]
-        for csv_file in csv_files:
-            if os.path.exists(csv_file):
+        # 清理上次运行残留的PNG、CSV和报告文件（JSON为生成器输入，不清理）
+        for file_type, filenames in ARCHIVE_FILE_GROUPS:
+            if file_type == "JSON":
+                continue
+            for filename in filenames:
                 try:
-                    os.remove(csv_file)
-                    cleaned_count += 1
-                    print(f"已删除CSV文件: {csv_file}")
+                    os.remove(filename)
+                    cleaned_files.append(filename)
+                except FileNotFoundError:
+                    continue
                 except Exception as e:
-                    print(f"删除CSV文件失败 {csv_file}: {e}")
+                    logger.error(f"删除{file_type}文件失败 {filename}: {e}")
         
-        # 3. 清理指定的PNG文件
-        png_files = ["well_structure_plot.png", "well_info.png"]
-        for png_file in png_files:
-            if os.path.exists(png_file):
-                try:
-                    os.remove(png_file)
-                    cleaned_count += 1
-                    print(f"已删除PNG文件: {png_file}")
-                except Exception as e:
-                    print(f"删除PNG文件失败 {png_file}: {e}")
-        
-        print(f"清理完成，共删除 {cleaned_count} 个文件")
+        if cleaned_files:
+            logger.debug("已删除文件: " + ", ".join(cleaned_files))
+        logger.info(f"清理完成，共删除 {len(cleaned_files)} 个文件")
         return True
     except Exception as e:
-        print(f"清理生成文件失败: {e}")
+        logger.error(f"清理生成文件失败: {e}")
         return False
 
 
 def wait_for_png_generation(max_attempts: int = 36) -> bool:
     """检测PNG图片生成，每隔1秒检查一次"""
     try:
-        print("开始检测PNG图片生成...")
+        logger.info("开始检测PNG图片生成...")
         for attempt in range(max_attempts):
-            png_files = glob.glob("well_structure_plot.png")
-            if png_files:
-                print(f"检测到PNG图片生成: {png_files}")
-                print("exe程序启动成功")
+            if os.path.exists("well_structure_plot.png"):
+                logger.info(f"第 {attempt + 1} 次检测到PNG图片生成: well_structure_plot.png")
+                logger.info("exe程序启动成功")
                 return True
             
-            print(f"第 {attempt + 1} 次检测，未发现PNG图片，继续等待...")
             time.sleep(1)
         
-        print(f"检测超时，{max_attempts} 次尝试后仍未发现PNG图片")
+        logger.warning(f"检测超时，{max_attempts} 次尝试后仍未发现PNG图片")
         return False
     except Exception as e:
-        print(f"检测PNG图片生成失败: {e}")
+        logger.error(f"检测PNG图片生成失败: {e}")
         return False
 
 
 def wait_for_report_generation(max_attempts: int = 36) -> bool:
     """检测报告文件生成，每隔1秒检查一次"""
     try:
-        print("开始检测报告文件生成...")
+        logger.info("开始检测报告文件生成...")
         for attempt in range(max_attempts):
             if os.path.exists("well_structure_report.md"):
-                print("检测到报告文件生成: well_structure_report.md")
+                logger.info(f"第 {attempt + 1} 次检测到报告文件生成: well_structure_report.md")
                 return True
             
-            print(f"第 {attempt + 1} 次检测，未发现报告文件，继续等待...")
             time.sleep(1)
         
-        print(f"检测超时，{max_attempts} 次尝试后仍未发现报告文件")
+        logger.warning(f"检测超时，{max_attempts} 次尝试后仍未发现报告文件")
         return False
     except Exception as e:
-        print(f"检测报告文件生成失败: {e}")
+        logger.error(f"检测报告文件生成失败: {e}")
         return False
 
 
@@ -305,10 +273,10 @@ def get_folder_absolute_path(folder_path: str) -> str:
         if folder.exists():
             return str(folder.absolute())
         else:
-            print("文件夹不存在")
+            logger.error("文件夹不存在")
             return ""
     except Exception as e:
-        print(f"获取文件夹路径失败: {e}")
+        logger.error(f"获取文件夹路径失败: {e}")
         return ""
 
 
@@ -318,7 +286,7 @@ def format_simple_response(structure_image_path: str, info_image_path: str) -> s
         response = f"井身结构示意图为：\n![PNG]({structure_image_path})\n\n井身结构信息图为：\n![PNG]({info_image_path})"
         return response
     except Exception as e:
-        print(f"格式化回答失败: {e}")
+        logger.error(f"格式化回答失败: {e}")
         return ""
 
 
@@ -330,7 +298,17 @@ def cleanup_temp_files():
         if backup_path.exists():
             backup_path.unlink()
     except Exception as e:
-        print(f"清理临时文件失败: {e}")
+        logger.error(f"清理临时文件失败: {e}")
+
+
+def build_error_response(error: str, error_code: str, details: str) -> Dict[str, Any]:
+    """构建失败结果字典"""
+    return {
+        "success": False,
+        "error": error,
+        "error_code": error_code,
+        "details": details
+    }
 
 
 @mcp.tool()
@@ -503,62 +481,32 @@ def generate_well_structure(well_data: Dict[str, Any]) -> Dict[str, Any]:
     try:
         # 验证数据
         if not validate_well_data(well_data):
-            return {
-                "success": False,
-                "error": "井数据验证失败",
-                "error_code": "VALIDATION_ERROR",
-                "details": "缺少必需字段或数据格式不正确"
-            }
+            return build_error_response("井数据验证失败", "VALIDATION_ERROR", "缺少必需字段或数据格式不正确")
         
         # 更新井数据文件
         if not update_well_data_file(well_data):
-            return {
-                "success": False,
-                "error": "更新井数据文件失败",
-                "error_code": "FILE_UPDATE_ERROR",
-                "details": "无法写入well_data.json文件"
-            }
+            return build_error_response("更新井数据文件失败", "FILE_UPDATE_ERROR", "无法写入well_data.json文件")
         
         # 启动生成器并检测PNG生成
         if not run_well_generator():
-            return {
-                "success": False,
-                "error": "井身结构生成器启动失败",
-                "error_code": "GENERATOR_ERROR",
-                "details": "生成器无法正常启动或PNG图片生成检测失败"
-            }
+            return build_error_response("井身结构生成器启动失败", "GENERATOR_ERROR", "生成器无法正常启动或PNG图片生成检测失败")
         
         # 创建时间戳文件夹并移动生成的文件
         timestamp_folder = create_timestamp_folder()
         if not timestamp_folder:
-            return {
-                "success": False,
-                "error": "创建归档文件夹失败",
-                "error_code": "FOLDER_CREATION_ERROR",
-                "details": "无法创建时间戳文件夹"
-            }
+            return build_error_response("创建归档文件夹失败", "FOLDER_CREATION_ERROR", "无法创建时间戳文件夹")
         
         # 先读取MD文件内容
         report_content = read_report_content("well_structure_report.md")
         
         # 一起移动所有文件
         if not move_generated_files(timestamp_folder):
-            return {
-                "success": False,
-                "error": "文件归档失败",
-                "error_code": "FILE_ARCHIVE_ERROR",
-                "details": "无法移动生成的文件到归档文件夹"
-            }
+            return build_error_response("文件归档失败", "FILE_ARCHIVE_ERROR", "无法移动生成的文件到归档文件夹")
         
         # 获取文件夹绝对路径
         folder_absolute_path = get_folder_absolute_path(timestamp_folder)
         if not folder_absolute_path:
-            return {
-                "success": False,
-                "error": "获取文件夹路径失败",
-                "error_code": "FOLDER_PATH_ERROR",
-                "details": "无法获取归档文件夹的绝对路径"
-            }
+            return build_error_response("获取文件夹路径失败", "FOLDER_PATH_ERROR", "无法获取归档文件夹的绝对路径")
         
         # 构建图片绝对路径
         structure_image_path = f"{folder_absolute_path}\\well_structure_plot.png"
@@ -587,12 +535,7 @@ def generate_well_structure(well_data: Dict[str, Any]) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        return {
-            "success": False,
-            "error": f"生成井身结构图时发生未知错误: {str(e)}",
-            "error_code": "UNKNOWN_ERROR",
-            "details": str(e)
-        }
+        return build_error_response(f"生成井身结构图时发生未知错误: {str(e)}", "UNKNOWN_ERROR", str(e))
 
 def main():
     """主入口函数"""